@@ -1,74 +1,269 @@
 import os
+import logging
 import time
-import requests
+import random
+import asyncio
+import aiohttp
+import orjson
 from dotenv import load_dotenv
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 # -------------------------------------------------------------------------
 # Load environment variables
 # -------------------------------------------------------------------------
 load_dotenv()
 
+logger = logging.getLogger("deepsearch")
+
+# -------------------------------------------------------------------------
+# Shared HTTP session (keep-alive + connection pooling)
+# -------------------------------------------------------------------------
+_API_KEY = os.getenv("BRIGHTDATA_API_KEY")
+_AUTH_HEADERS = {"Authorization": f"Bearer {_API_KEY}"} if _API_KEY else None
+
+REQUEST_TIMEOUT = 120
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the application-wide aiohttp session, creating it on first use."""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=64, limit_per_host=32, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        )
+    return _SESSION
+
+
+async def close_session() -> None:
+    """Close the shared aiohttp session. Call once before the event loop shuts down."""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+
+# -------------------------------------------------------------------------
+# 🛡️ Transport retries + circuit breaker
+# -------------------------------------------------------------------------
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuses where the server did not act on the request, so even a POST is safe to resend.
+UNPROCESSED_STATUSES = frozenset({429, 503})
+MAX_TRANSIENT_RETRIES = 3
+MAX_RETRY_AFTER = 30.0
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_BACKOFF_JITTER = 0.5
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The caller's time budget ran out; says nothing about Bright Data's health."""
+
+
+def is_transient_error(err: BaseException) -> bool:
+    """True for failures that indicate Bright Data is unhealthy (429/5xx, network, timeout)."""
+    if isinstance(err, DeadlineExceeded):
+        return False
+    if isinstance(err, aiohttp.ClientResponseError):
+        return err.status in RETRY_STATUSES
+    return isinstance(err, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+class Breaker:
+    """In-process circuit breaker that fails fast after repeated Bright Data failures."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.fail_count = 0
+        self.opened_until = 0.0
+
+    def is_open(self) -> bool:
+        return time.monotonic() < self.opened_until
+
+    def record_success(self) -> None:
+        self.fail_count = 0
+
+    def record_failure(self, err: BaseException) -> None:
+        """Count `err` towards opening the circuit; client errors (4xx, bad data) don't count."""
+        if not is_transient_error(err):
+            return
+        self.fail_count += 1
+        if self.fail_count >= self.threshold:
+            logger.error("🚫 Bright Data circuit opened for %.0f s", self.cooldown)
+            self.opened_until = time.monotonic() + self.cooldown
+            self.fail_count = 0
+
+
+breaker = Breaker()
+
+
+def _retry_delay(response: Optional[aiohttp.ClientResponse], attempt: int) -> float:
+    """Backoff before the next transient retry, honoring (capped) Retry-After when given."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), MAX_RETRY_AFTER)
+    return RETRY_BACKOFF_FACTOR * (2 ** attempt) + random.uniform(0, RETRY_BACKOFF_JITTER)
+
+
+async def send_request(
+    method: str,
+    url: str,
+    retries: int = MAX_TRANSIENT_RETRIES,
+    deadline: Optional[float] = None,
+    **kwargs,
+) -> Tuple[aiohttp.ClientResponse, bytes]:
+    """
+    Send a request on the shared session, retrying transient failures.
+
+    GETs are retried on 429/5xx, connection errors and timeouts. Other methods are
+    only retried when the server cannot have acted on them (429/503 or a failed
+    connect), so a POST trigger is never duplicated. When `deadline` (a
+    time.monotonic() value) is given, every attempt and backoff stays within it.
+    Returns the response and its body.
+    """
+    idempotent = method.upper() == "GET"
+    retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+    retry_errors = aiohttp.ClientConnectionError if idempotent else aiohttp.ClientConnectorError
+
+    for attempt in range(retries + 1):
+        timeout = REQUEST_TIMEOUT
+        clamped = False
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded before {method} {url}")
+            clamped = remaining < timeout
+            timeout = min(timeout, remaining)
+
+        response = body = None
+        try:
+            async with get_session().request(
+                method, url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs
+            ) as response:
+                body = await response.read()
+            if response.status not in retry_statuses or attempt == retries:
+                return response, body
+        except asyncio.TimeoutError as err:
+            # A timeout shortened by the caller's deadline is the deadline running out,
+            # not a slow upstream, so it must not count against the breaker.
+            if clamped:
+                raise DeadlineExceeded(f"Deadline exceeded during {method} {url}") from err
+            if not idempotent or attempt == retries:
+                raise
+        except retry_errors:
+            if attempt == retries:
+                raise
+
+        delay = _retry_delay(response, attempt)
+        if deadline is not None and delay >= deadline - time.monotonic():
+            if body is not None:
+                return response, body
+            raise DeadlineExceeded(f"Deadline exceeded retrying {method} {url}")
+        await asyncio.sleep(delay)
+
 
 # -------------------------------------------------------------------------
 # 🧩 Helper: Monitor snapshot progress
 # -------------------------------------------------------------------------
-def check_snapshot_status(
+async def check_snapshot_status(
     snapshot_id: str,
-    max_retries: int = 60,
-    interval: int = 5,
+    timeout_seconds: float = 300.0,
+    base: float = 0.5,
+    cap: float = 15.0,
 ) -> bool:
     """
     Continuously poll the Bright Data API until a dataset snapshot is ready.
 
+    Polls are spaced with capped exponential backoff and full jitter, so short
+    jobs are picked up almost immediately while long jobs are polled less often.
+    The last ETag is sent back as If-None-Match, so unchanged progress comes back
+    as an empty 304 instead of a fresh JSON body.
+
     Args:
         snapshot_id (str): The unique identifier of the snapshot.
-        max_retries (int): Maximum number of polling attempts before timeout.
-        interval (int): Time delay (in seconds) between checks.
+        timeout_seconds (float): Wall-clock budget (in seconds) before giving up.
+        base (float): Initial backoff delay (in seconds).
+        cap (float): Upper bound for a single backoff delay (in seconds).
 
     Returns:
         bool: True if the snapshot completes successfully, False otherwise.
     """
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
-    if not api_key:
+    if not _AUTH_HEADERS:
         raise EnvironmentError("Missing BRIGHTDATA_API_KEY in environment variables.")
 
     progress_endpoint = f"https://api.brightdata.com/datasets/v3/progress/{snapshot_id}"
-    headers = {"Authorization": f"Bearer {api_key}"}
+    headers = dict(_AUTH_HEADERS)
+    deadline = time.monotonic() + timeout_seconds
+    attempt = 0
+    backoff_step = 0
+    had_error = False
+
+    while True:
+        if breaker.is_open():
+            logger.error("❌ Stopped polling snapshot %s: Bright Data circuit is open", snapshot_id)
+            return False
 
-    for attempt in range(1, max_retries + 1):
+        attempt += 1
         try:
-            print(f"⏳ Checking snapshot status... (Attempt {attempt}/{max_retries})")
-            response = requests.get(progress_endpoint, headers=headers)
-            response.raise_for_status()
+            logger.debug("Checking snapshot status attempt %d", attempt)
+            # The poll loop does its own backoff, so no transport-level retries here.
+            response, body = await send_request(
+                "GET", progress_endpoint, retries=0, deadline=deadline, headers=headers
+            )
+            if response.status == 304:
+                # Unchanged since the last poll; no body to parse.
+                status = "running"
+            else:
+                response.raise_for_status()
+                status = orjson.loads(body).get("status")
+
+                etag = response.headers.get("ETag")
+                if etag:
+                    headers["If-None-Match"] = etag
+                else:
+                    headers.pop("If-None-Match", None)
+
+            breaker.record_success()
 
-            data = response.json()
-            status = data.get("status")
+            # A successful poll after a transient error restarts the backoff curve.
+            if had_error:
+                backoff_step = 0
+                had_error = False
 
             if status == "ready":
-                print("✅ Snapshot is ready for download!")
+                logger.info("✅ Snapshot %s is ready for download", snapshot_id)
                 return True
             elif status == "failed":
-                print("❌ Snapshot processing failed.")
+                logger.error("❌ Snapshot %s processing failed", snapshot_id)
                 return False
             elif status == "running":
-                print("🔄 Snapshot still in progress...")
+                logger.debug("Snapshot %s still in progress", snapshot_id)
             else:
-                print(f"❓ Unexpected status received: {status}")
+                logger.warning("❓ Unexpected snapshot status received: %s", status)
 
         except Exception as err:
-            print(f"⚠️ Error while checking snapshot: {err}")
+            logger.warning("⚠️ Error while checking snapshot: %s", err)
+            breaker.record_failure(err)
+            had_error = True
 
-        time.sleep(interval)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
 
-    print("⏰ Timed out waiting for snapshot to complete.")
+        delay = random.uniform(0, min(cap, base * (2 ** min(backoff_step, 6))))
+        backoff_step += 1
+        await asyncio.sleep(min(delay, remaining))
+
+    logger.error("⏰ Timed out waiting for snapshot %s to complete", snapshot_id)
     return False
 
 
 # -------------------------------------------------------------------------
 # 📥 Helper: Download snapshot data
 # -------------------------------------------------------------------------
-def fetch_snapshot_data(
+async def fetch_snapshot_data(
     snapshot_id: str,
     file_format: str = "json",
 ) -> Optional[List[Dict[Any, Any]]]:
@@ -82,26 +277,30 @@ def fetch_snapshot_data(
     Returns:
         Optional[List[Dict[Any, Any]]]: Parsed data list if successful, None otherwise.
     """
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
-    if not api_key:
+    if not _AUTH_HEADERS:
         raise EnvironmentError("Missing BRIGHTDATA_API_KEY in environment variables.")
 
     download_endpoint = (
         f"https://api.brightdata.com/datasets/v3/snapshot/{snapshot_id}?format={file_format}"
     )
-    headers = {"Authorization": f"Bearer {api_key}"}
+
+    if breaker.is_open():
+        logger.error("❌ Skipping snapshot download: Bright Data circuit is open")
+        return None
 
     try:
-        print("📦 Downloading snapshot content...")
-        response = requests.get(download_endpoint, headers=headers)
+        logger.debug("Downloading snapshot %s", snapshot_id)
+        response, body = await send_request("GET", download_endpoint, headers=_AUTH_HEADERS)
         response.raise_for_status()
+        data = orjson.loads(body)
+        breaker.record_success()
 
-        data = response.json()
         item_count = len(data) if isinstance(data, list) else 1
 
-        print(f"🎉 Download complete — retrieved {item_count} record(s).")
+        logger.info("🎉 Download complete — retrieved %d record(s)", item_count)
         return data
 
     except Exception as err:
-        print(f"❌ Failed to download snapshot: {err}")
+        logger.error("❌ Failed to download snapshot: %s", err)
+        breaker.record_failure(err)
         return None
\ No newline at end of file
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import pickle
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import diskcache
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# -------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------
+LLM_CACHE_TTL = 3600
+SERP_CACHE_TTL = 600
+SEMANTIC_CACHE_PATH = "./.semcache.pkl"
+SEMANTIC_CACHE_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL = 3600
+
+_MISSING = object()
+
+
+class LLMCache:
+    """
+    Two-level (memory + optional disk) TTL cache for LLM and SERP responses.
+
+    Entries are keyed by a SHA-256 digest of the request, so identical queries
+    re-run from the REPL skip both the Bright Data round-trip and the paid LLM call.
+    """
+
+    def __init__(self, directory: Optional[str] = "./.cache", ttl: float = LLM_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: Dict[str, Tuple[float, Any]] = {}
+        self._disk = diskcache.Cache(directory) if directory else None
+
+    # -------------------------------------------------------------------------
+    # 🔑 Key Builders
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def llm_key(model: str, messages: Any) -> str:
+        """Build a cache key for an LLM call."""
+        raw = json.dumps(
+            {"model": model, "messages": messages, "temperature": 0},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def search_key(engine: str, query: str) -> str:
+        """Build a cache key for a SERP search."""
+        return hashlib.sha256(f"{engine}:{query}".encode("utf-8")).hexdigest()
+
+    # -------------------------------------------------------------------------
+    # 📦 Lookup / Store
+    # -------------------------------------------------------------------------
+    def get(self, key: str) -> Any:
+        """Return the cached value for `key`, or None if missing or expired."""
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value` under `key` for `ttl` seconds (defaults to the cache TTL)."""
+        ttl = self.ttl if ttl is None else ttl
+        self._memory[key] = (time.monotonic() + ttl, value)
+        if self._disk is not None:
+            self._disk.set(key, value, expire=ttl)
+
+    async def aget_or_set(
+        self, key: str, factory: Callable[[], Awaitable[Any]], ttl: Optional[float] = None
+    ) -> Any:
+        """Return the cached value for `key`, awaiting `factory` and storing its result on a miss."""
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await factory()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def report(self) -> str:
+        """Summarize cache effectiveness."""
+        return f"Cache hits: {self.hits}, misses: {self.misses}"
+
+    def close(self) -> None:
+        """Release the disk backend."""
+        if self._disk is not None:
+            self._disk.close()
+
+    def _lookup(self, key: str) -> Any:
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                return value
+            del self._memory[key]
+
+        if self._disk is not None:
+            value, expire_time = self._disk.get(key, default=_MISSING, expire_time=True)
+            if value is not _MISSING:
+                remaining = self.ttl if expire_time is None else expire_time - time.time()
+                self._memory[key] = (time.monotonic() + remaining, value)
+            return value
+
+        return _MISSING
+
+
+class SemanticCache:
+    """
+    Embedding-based cache of completed research runs.
+
+    Paraphrased questions ("capital of France?" / "France's capital") map to nearby
+    embeddings, so a prior run's final state can be reused when cosine similarity
+    is above the threshold. Entries expire after `ttl` seconds, like the LLM and
+    SERP caches, and are persisted with pickle between sessions.
+    """
+
+    def __init__(
+        self,
+        path: str = SEMANTIC_CACHE_PATH,
+        model_name: str = SEMANTIC_CACHE_MODEL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+    ):
+        self.path = path
+        self.threshold = threshold
+        self.ttl = ttl
+        self._model = SentenceTransformer(model_name)
+        self._states: List[dict] = []
+        self._created: List[float] = []
+        self._matrix = np.empty(
+            (0, self._model.get_sentence_embedding_dimension()), dtype=np.float32
+        )
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                entries: List[Tuple[np.ndarray, dict, float]] = pickle.load(f)
+            # Entries without a timestamp predate expiry support and are dropped.
+            entries = [e for e in entries if len(e) == 3]
+            if entries:
+                self._matrix = np.vstack([emb for emb, _, _ in entries]).astype(np.float32)
+                self._states = [state for _, state, _ in entries]
+                self._created = [created for _, _, created in entries]
+            self._prune()
+
+    def embed(self, query: str) -> np.ndarray:
+        """Return the normalized embedding for `query`."""
+        return self._model.encode(query, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, query_embedding: np.ndarray) -> Optional[dict]:
+        """Return the cached state of the most similar unexpired prior query, if close enough."""
+        self._prune()
+        if not self._states:
+            return None
+        # Embeddings are normalized, so a single mat-vec product gives cosine similarities.
+        sims = self._matrix @ query_embedding
+        best = int(sims.argmax())
+        return self._states[best] if sims[best] >= self.threshold else None
+
+    def add(self, query_embedding: np.ndarray, state: dict) -> None:
+        """Record a completed run and persist the cache to disk."""
+        self._matrix = np.vstack([self._matrix, query_embedding[np.newaxis, :]])
+        self._states.append(state)
+        self._created.append(time.time())
+        self._save()
+
+    def _prune(self) -> None:
+        """Evict entries older than the TTL, persisting the cache if anything was dropped."""
+        cutoff = time.time() - self.ttl
+        keep = [i for i, created in enumerate(self._created) if created >= cutoff]
+        if len(keep) == len(self._created):
+            return
+        self._matrix = self._matrix[keep]
+        self._states = [self._states[i] for i in keep]
+        self._created = [self._created[i] for i in keep]
+        self._save()
+
+    def _save(self) -> None:
+        with open(self.path, "wb") as f:
+            pickle.dump(list(zip(self._matrix, self._states, self._created)), f)
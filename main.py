@@ -1,42 +1,71 @@
+import os
+import re
+import queue
+import asyncio
+import logging
+import logging.handlers
 from dotenv import load_dotenv
 from typing import Annotated, List
-from typing_extensions import TypedDict
+from dataclasses import dataclass, field
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain.chat_models import init_chat_model
 
 # Local module imports
+from cache import LLMCache, SemanticCache, SERP_CACHE_TTL
 from web_operations import serp_search, reddit_search_api, reddit_post_retrieval
+from snapshot_operations import close_session
 from prompts import (
-    get_reddit_analysis_messages,
-    get_google_analysis_messages,
-    get_bing_analysis_messages,
     get_reddit_url_analysis_messages,
-    get_synthesis_messages
+    get_synthesis_messages,
+    tri_analysis_msgs,
+    compact_serp_output,
+    compact_reddit_search,
+    compact_reddit_comments,
 )
 
 # -------------------------------------------------------------------------
 # Setup
 # -------------------------------------------------------------------------
 load_dotenv()
-llm = init_chat_model("gpt-4o")
+logger = logging.getLogger("deepsearch")
+
+LLM_MODEL = "gpt-4o"
+llm = init_chat_model(LLM_MODEL, max_retries=2, timeout=60)
+cache = LLMCache()
+
+
+async def cached_structured_invoke(prompts, schema):
+    """Invoke the LLM with structured output, reusing cached responses for identical prompts."""
+    key = LLMCache.llm_key(f"{LLM_MODEL}:{schema.__name__}", prompts)
+    structured_llm = llm.with_structured_output(schema)
+    return await cache.aget_or_set(key, lambda: structured_llm.ainvoke(prompts))
+
+
+async def cached_serp_search(query: str, engine: str):
+    """Run a SERP search, reusing a cached result for the same (engine, query)."""
+    key = LLMCache.search_key(engine, query)
+    return await cache.aget_or_set(
+        key, lambda: serp_search(query, engine=engine), ttl=SERP_CACHE_TTL
+    )
 
 # -------------------------------------------------------------------------
 # State Definition
 # -------------------------------------------------------------------------
-class ResearchState(TypedDict):
-    messages: Annotated[list, add_messages]
-    user_query: str | None
-    google_output: str | None
-    bing_output: str | None
-    reddit_output: str | None
-    chosen_reddit_urls: list[str] | None
-    reddit_posts_data: list | None
-    google_summary: str | None
-    bing_summary: str | None
-    reddit_summary: str | None
-    final_summary: str | None
+@dataclass(slots=True)
+class ResearchState:
+    messages: Annotated[list, add_messages] = field(default_factory=list)
+    user_query: str | None = None
+    google_output: dict | None = None
+    bing_output: dict | None = None
+    reddit_output: dict | None = None
+    chosen_reddit_urls: list[str] | None = None
+    reddit_posts_data: dict | None = None
+    google_summary: str | None = None
+    bing_summary: str | None = None
+    reddit_summary: str | None = None
+    final_summary: str | None = None
 
 
 class RedditURLSelection(BaseModel):
@@ -44,113 +73,182 @@ class RedditURLSelection(BaseModel):
         description="Top Reddit URLs containing meaningful insights or discussions related to the query."
     )
 
+
+class TriSummary(BaseModel):
+    google: str = Field(description="Key findings from the Google search results.")
+    bing: str = Field(description="Complementary insights from the Bing search results.")
+    reddit: str = Field(description="Community insights from the Reddit posts and comments.")
+
 # -------------------------------------------------------------------------
 # Core Search Nodes
 # -------------------------------------------------------------------------
-def perform_google_search(state: ResearchState):
-    query = state.get("user_query", "")
-    print(f"[Google] Searching for: {query}")
-    return {"google_output": serp_search(query, engine="google")}
+async def perform_google_search(state: ResearchState):
+    query = state.user_query
+    logger.info("[Google] Searching for: %s", query)
+    return {"google_output": await cached_serp_search(query, engine="google")}
 
 
-def perform_bing_search(state: ResearchState):
-    query = state.get("user_query", "")
-    print(f"[Bing] Searching for: {query}")
-    return {"bing_output": serp_search(query, engine="bing")}
+async def perform_bing_search(state: ResearchState):
+    query = state.user_query
+    logger.info("[Bing] Searching for: %s", query)
+    return {"bing_output": await cached_serp_search(query, engine="bing")}
 
 
-def perform_reddit_search(state: ResearchState):
-    query = state.get("user_query", "")
-    print(f"[Reddit] Searching for: {query}")
-    reddit_data = reddit_search_api(keyword=query)
-    print(reddit_data)
+async def perform_reddit_search(state: ResearchState):
+    query = state.user_query
+    logger.info("[Reddit] Searching for: %s", query)
+    reddit_data = await reddit_search_api(keyword=query)
     return {"reddit_output": reddit_data}
 
 # -------------------------------------------------------------------------
 # Reddit URL Filtering and Post Retrieval
 # -------------------------------------------------------------------------
-def extract_reddit_urls(state: ResearchState):
-    query = state.get("user_query", "")
-    reddit_raw = state.get("reddit_output", "")
+REDDIT_URL_LIMIT = 8
+REDDIT_DIRECT_PICK_MAX = 10
+REDDIT_MIN_KEYWORD_OVERLAP = 0.5
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and any are about be best but can could did do does for from get has have how "
+    "i if in into is it its me my of on or our should so than that the their them there "
+    "these this to vs was we what when where which who why will with would you your".split()
+)
+
+
+def _content_terms(text: str | None) -> set[str]:
+    """Lower-cased words of `text`, minus stop words and tokens under three characters."""
+    if not text:
+        return set()
+    return {
+        w for w in _WORD_RE.findall(text.lower())
+        if len(w) >= 3 and w not in _STOP_WORDS
+    }
+
+
+def _keyword_overlap(query_terms: set[str], title: str | None) -> float:
+    """Fraction of query content terms that appear in a post title."""
+    if not query_terms:
+        return 0.0
+    return len(query_terms & _content_terms(title)) / len(query_terms)
+
+
+def _preselect_reddit_urls(query: str, posts: list[dict]) -> list[str] | None:
+    """
+    Pick Reddit URLs without the LLM when the choice is obvious.
+
+    Small result sets are taken as-is in Bright Data's ranking order. Larger sets are
+    taken by keyword overlap when enough titles clearly match the query; otherwise
+    None is returned and the caller falls back to the LLM selector.
+    """
+    posts = [p for p in posts if p.get("url")]
+    if len(posts) <= REDDIT_DIRECT_PICK_MAX:
+        return [p["url"] for p in posts[:REDDIT_URL_LIMIT]]
+
+    query_terms = _content_terms(query)
+    if not query_terms:
+        return None
+
+    scored = sorted(
+        ((_keyword_overlap(query_terms, p.get("title")), p["url"]) for p in posts),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+    top = scored[:REDDIT_URL_LIMIT]
+    if top[-1][0] >= REDDIT_MIN_KEYWORD_OVERLAP:
+        return [url for _, url in top]
+    return None
+
+
+async def extract_reddit_urls(state: ResearchState):
+    query = state.user_query
+    reddit_raw = state.reddit_output
 
     if not reddit_raw:
         return {"chosen_reddit_urls": []}
 
-    structured_llm = llm.with_structured_output(RedditURLSelection)
-    prompts = get_reddit_url_analysis_messages(query, reddit_raw)
+    urls = _preselect_reddit_urls(query, reddit_raw.get("parsed_posts", []))
+    if urls is None:
+        structured_llm = llm.with_structured_output(RedditURLSelection)
+        prompts = get_reddit_url_analysis_messages(query, compact_reddit_search(reddit_raw))
 
-    try:
-        result = structured_llm.invoke(prompts)
-        urls = result.selected_urls
-        print("🧩 Selected Reddit URLs:")
-        for idx, u in enumerate(urls, 1):
-            print(f"  {idx}. {u}")
-    except Exception as e:
-        print(f"Error during Reddit URL extraction: {e}")
-        urls = []
+        try:
+            result = await structured_llm.ainvoke(prompts)
+            urls = result.selected_urls
+        except Exception as e:
+            logger.error("Error during Reddit URL extraction: %s", e)
+            urls = []
+
+    if urls and logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "🧩 Selected Reddit URLs:\n%s",
+            "\n".join(f"  {idx}. {u}" for idx, u in enumerate(urls, 1)),
+        )
 
     return {"chosen_reddit_urls": urls}
 
 
-def fetch_reddit_posts(state: ResearchState):
-    urls = state.get("chosen_reddit_urls", [])
+async def fetch_reddit_posts(state: ResearchState):
+    urls = state.chosen_reddit_urls
     if not urls:
-        print("[Reddit] No URLs to fetch.")
-        return {"reddit_posts_data": []}
+        logger.info("[Reddit] No URLs to fetch.")
+        return {"reddit_posts_data": None}
 
-    print(f"[Reddit] Fetching posts from {len(urls)} URLs...")
-    posts = reddit_post_retrieval(urls)
+    logger.info("[Reddit] Fetching posts from %d URLs...", len(urls))
+    posts = await reddit_post_retrieval(urls)
 
     if posts:
-        print(f"[Reddit] Successfully retrieved {len(posts)} posts.")
+        logger.info("[Reddit] Successfully retrieved %d comments.", posts["total_retrieved"])
     else:
-        print("[Reddit] Failed to retrieve any post data.")
+        logger.warning("[Reddit] Failed to retrieve any post data.")
 
-    return {"reddit_posts_data": posts or []}
+    return {"reddit_posts_data": posts}
 
 # -------------------------------------------------------------------------
-# Analysis Nodes (Google, Bing, Reddit)
+# Analysis Node (Google, Bing, Reddit in a single LLM call)
 # -------------------------------------------------------------------------
-def analyze_google_data(state: ResearchState):
-    print("[Analysis] Evaluating Google search results...")
-    query = state.get("user_query", "")
-    google_content = state.get("google_output", "")
-    prompts = get_google_analysis_messages(query, google_content)
-    response = llm.invoke(prompts)
-    return {"google_summary": response.content}
-
-
-def analyze_bing_data(state: ResearchState):
-    print("[Analysis] Evaluating Bing search results...")
-    query = state.get("user_query", "")
-    bing_content = state.get("bing_output", "")
-    prompts = get_bing_analysis_messages(query, bing_content)
-    response = llm.invoke(prompts)
-    return {"bing_summary": response.content}
-
-
-def analyze_reddit_data(state: ResearchState):
-    print("[Analysis] Evaluating Reddit discussions...")
-    query = state.get("user_query", "")
-    reddit_raw = state.get("reddit_output", "")
-    reddit_posts = state.get("reddit_posts_data", "")
-    prompts = get_reddit_analysis_messages(query, reddit_raw, reddit_posts)
-    response = llm.invoke(prompts)
-    return {"reddit_summary": response.content}
+async def analyze_all_sources(state: ResearchState):
+    logger.info("[Analysis] Evaluating Google, Bing, and Reddit results...")
+    query = state.user_query
+    prompts = tri_analysis_msgs(
+        query,
+        compact_serp_output(state.google_output),
+        compact_serp_output(state.bing_output),
+        compact_reddit_search(state.reddit_output),
+        compact_reddit_comments(state.reddit_posts_data),
+    )
+    result = await cached_structured_invoke(prompts, TriSummary)
+    return {
+        "google_summary": result.google,
+        "bing_summary": result.bing,
+        "reddit_summary": result.reddit,
+    }
 
 # -------------------------------------------------------------------------
 # Final Synthesis
 # -------------------------------------------------------------------------
-def combine_insights(state: ResearchState):
-    print("[Synthesis] Merging all analyses into a unified summary...")
-    query = state.get("user_query", "")
-    google_summary = state.get("google_summary", "")
-    bing_summary = state.get("bing_summary", "")
-    reddit_summary = state.get("reddit_summary", "")
+async def combine_insights(state: ResearchState):
+    logger.info("[Synthesis] Merging all analyses into a unified summary...")
+    query = state.user_query
+    google_summary = state.google_summary
+    bing_summary = state.bing_summary
+    reddit_summary = state.reddit_summary
 
     prompts = get_synthesis_messages(query, google_summary, bing_summary, reddit_summary)
-    response = llm.invoke(prompts)
-    final = response.content
+    key = LLMCache.llm_key(LLM_MODEL, prompts)
+
+    # Stream the answer to the terminal as it is generated.
+    print("\n🧠 Final Synthesized Insight:\n")
+    response = cache.get(key)
+    if response is not None:
+        print(response.content, end="", flush=True)
+    else:
+        async for chunk in llm.astream(prompts):
+            print(chunk.content, end="", flush=True)
+            response = chunk if response is None else response + chunk
+        if response is not None:
+            cache.set(key, response)
+    print("\n" + "-" * 80)
+
+    final = response.content if response is not None else ""
 
     return {
         "final_summary": final,
@@ -167,9 +265,7 @@ workflow.add_node("bing_search", perform_bing_search)
 workflow.add_node("reddit_search", perform_reddit_search)
 workflow.add_node("extract_reddit_urls", extract_reddit_urls)
 workflow.add_node("fetch_reddit_posts", fetch_reddit_posts)
-workflow.add_node("analyze_google", analyze_google_data)
-workflow.add_node("analyze_bing", analyze_bing_data)
-workflow.add_node("analyze_reddit", analyze_reddit_data)
+workflow.add_node("analyze_all", analyze_all_sources)
 workflow.add_node("synthesize_results", combine_insights)
 
 # Edges
@@ -182,13 +278,9 @@ workflow.add_edge("bing_search", "extract_reddit_urls")
 workflow.add_edge("reddit_search", "extract_reddit_urls")
 workflow.add_edge("extract_reddit_urls", "fetch_reddit_posts")
 
-workflow.add_edge("fetch_reddit_posts", "analyze_google")
-workflow.add_edge("fetch_reddit_posts", "analyze_bing")
-workflow.add_edge("fetch_reddit_posts", "analyze_reddit")
-
-workflow.add_edge("analyze_google", "synthesize_results")
-workflow.add_edge("analyze_bing", "synthesize_results")
-workflow.add_edge("analyze_reddit", "synthesize_results")
+# A single combined analysis runs once every source has been collected.
+workflow.add_edge(["google_search", "bing_search", "fetch_reddit_posts"], "analyze_all")
+workflow.add_edge("analyze_all", "synthesize_results")
 
 workflow.add_edge("synthesize_results", END)
 
@@ -197,38 +289,64 @@ compiled_graph = workflow.compile()
 # -------------------------------------------------------------------------
 # CLI Execution
 # -------------------------------------------------------------------------
-def start_agent():
+def configure_logging() -> logging.handlers.QueueListener:
+    """Route log records through a queue so handler I/O never blocks the event loop."""
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    # Third-party libraries (httpx, langchain, sentence-transformers) stay at WARNING;
+    # LOG_LEVEL only controls this agent's own logger.
+    logging.basicConfig(
+        level=logging.WARNING,
+        handlers=[logging.handlers.QueueHandler(log_queue)],
+    )
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, console)
+    listener.start()
+    return listener
+
+
+async def start_agent():
     print("🤖 Multi-Source Deep Research Agent")
     print("Type 'exit' to quit.\n")
 
-    while True:
-        query = input("Enter your question: ")
-        if query.lower() == "exit":
-            print("Goodbye 👋")
-            break
-
-        print("\n🔎 Starting comprehensive web research...\n")
-        state = {
-            "messages": [{"role": "user", "content": query}],
-            "user_query": query,
-            "google_output": None,
-            "bing_output": None,
-            "reddit_output": None,
-            "chosen_reddit_urls": None,
-            "reddit_posts_data": None,
-            "google_summary": None,
-            "bing_summary": None,
-            "reddit_summary": None,
-            "final_summary": None,
-        }
-
-        final_state = compiled_graph.invoke(state)
-
-        if final_state.get("final_summary"):
-            print("\n🧠 Final Synthesized Insight:\n")
-            print(final_state["final_summary"])
-            print("\n" + "-" * 80)
+    semantic_cache = SemanticCache()
+
+    try:
+        while True:
+            query = await asyncio.to_thread(input, "Enter your question: ")
+            if query.lower() == "exit":
+                print("Goodbye 👋")
+                break
+
+            print("\n🔎 Starting comprehensive web research...\n")
+            state = ResearchState(
+                messages=[{"role": "user", "content": query}],
+                user_query=query,
+            )
+
+            query_embedding = semantic_cache.embed(query)
+            final_state = semantic_cache.lookup(query_embedding)
+            if final_state is not None:
+                logger.info("♻️ Reusing the answer from a similar earlier question.")
+                print("\n🧠 Final Synthesized Insight:\n")
+                print(final_state["final_summary"])
+                print("\n" + "-" * 80)
+            else:
+                # The synthesis node streams the answer to the terminal itself.
+                final_state = await compiled_graph.ainvoke(state)
+                if final_state.get("final_summary"):
+                    semantic_cache.add(query_embedding, final_state)
+
+    finally:
+        await close_session()
+        logger.info(cache.report())
+        cache.close()
 
 
 if __name__ == "__main__":
-    start_agent()
\ No newline at end of file
+    log_listener = configure_logging()
+    try:
+        asyncio.run(start_agent())
+    finally:
+        log_listener.stop()
\ No newline at end of file
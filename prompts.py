@@ -1,131 +1,155 @@
+import re
+import html
+import orjson
 from typing import Dict, Any, List
 
+# -------------------------------------------------------------------------
+# 🧩 Reddit URL Analysis
+# -------------------------------------------------------------------------
+# System prompt: Select the most relevant Reddit URLs.
+REDDIT_URL_SELECTOR_SYSTEM = (
+    "You are a skilled social media content analyst. Your task is to review Reddit search results "
+    "and identify URLs of posts that offer strong informational value for answering the user's query.\n\n"
+    "Focus on posts that:\n"
+    "- Closely address the user's question\n"
+    "- Include detailed discussions, expert advice, or data-backed claims\n"
+    "- Show strong community engagement (upvotes/comments)\n"
+    "- Contribute diverse or unique perspectives\n\n"
+    "Return a structured list containing the most relevant Reddit URLs."
+)
 
-class PromptFactory:
-    """Centralized repository for all LLM prompt templates used by the Deep Research Agent."""
+_REDDIT_URL_SELECTOR_USER_TMPL = (
+    "User Question: {question}\n\n"
+    "Reddit Search Results:\n{reddit_output}\n\n"
+    "Analyze the above Reddit results and identify posts most useful for addressing the question."
+)
 
-    # -------------------------------------------------------------------------
-    # 🧩 Reddit URL Analysis
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def reddit_url_selector_system() -> str:
-        """System prompt: Select the most relevant Reddit URLs."""
-        return (
-            "You are a skilled social media content analyst. Your task is to review Reddit search results "
-            "and identify URLs of posts that offer strong informational value for answering the user's query.\n\n"
-            "Focus on posts that:\n"
-            "- Closely address the user's question\n"
-            "- Include detailed discussions, expert advice, or data-backed claims\n"
-            "- Show strong community engagement (upvotes/comments)\n"
-            "- Contribute diverse or unique perspectives\n\n"
-            "Return a structured list containing the most relevant Reddit URLs."
-        )
 
-    @staticmethod
-    def reddit_url_selector_user(question: str, reddit_output: str) -> str:
-        """User prompt: Provide Reddit search results for filtering."""
-        return (
-            f"User Question: {question}\n\n"
-            f"Reddit Search Results:\n{reddit_output}\n\n"
-            "Analyze the above Reddit results and identify posts most useful for addressing the question."
-        )
+# -------------------------------------------------------------------------
+# 🌐 Google Search Analysis
+# -------------------------------------------------------------------------
+# System prompt: Analyze Google search results.
+GOOGLE_ANALYSIS_SYSTEM = (
+    "You are an expert research analyst. Review the provided Google search results and extract key insights "
+    "that help answer the user's question.\n\n"
+    "Focus on:\n"
+    "- Verified facts and authoritative sources (official docs, academic papers, reputable sites)\n"
+    "- Important statistics, dates, and figures\n"
+    "- Conflicting viewpoints or data inconsistencies\n\n"
+    "Deliver a concise, factual summary highlighting the most relevant insights."
+)
 
-    # -------------------------------------------------------------------------
-    # 🌐 Google Search Analysis
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def google_analysis_system() -> str:
-        """System prompt: Analyze Google search results."""
-        return (
-            "You are an expert research analyst. Review the provided Google search results and extract key insights "
-            "that help answer the user's question.\n\n"
-            "Focus on:\n"
-            "- Verified facts and authoritative sources (official docs, academic papers, reputable sites)\n"
-            "- Important statistics, dates, and figures\n"
-            "- Conflicting viewpoints or data inconsistencies\n\n"
-            "Deliver a concise, factual summary highlighting the most relevant insights."
-        )
 
-    @staticmethod
-    def google_analysis_user(question: str, google_output: str) -> str:
-        """User prompt: Provide Google search results."""
-        return (
-            f"Question: {question}\n\n"
-            f"Google Search Results:\n{google_output}\n\n"
-            "Analyze these Google results and extract key findings that help answer the question."
-        )
+# -------------------------------------------------------------------------
+# 🧠 Bing Search Analysis
+# -------------------------------------------------------------------------
+# System prompt: Analyze Bing search results.
+BING_ANALYSIS_SYSTEM = (
+    "You are an analytical researcher. Review Bing search results to uncover complementary insights that "
+    "enrich the understanding of the user's query.\n\n"
+    "Focus on:\n"
+    "- Technical articles and enterprise perspectives\n"
+    "- Alternative viewpoints not present in other sources\n"
+    "- Recent news updates and announcements\n"
+    "- Microsoft ecosystem or industry-specific insights\n\n"
+    "Summarize the distinct and useful information found in these results."
+)
 
-    # -------------------------------------------------------------------------
-    # 🧠 Bing Search Analysis
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def bing_analysis_system() -> str:
-        """System prompt: Analyze Bing search results."""
-        return (
-            "You are an analytical researcher. Review Bing search results to uncover complementary insights that "
-            "enrich the understanding of the user's query.\n\n"
-            "Focus on:\n"
-            "- Technical articles and enterprise perspectives\n"
-            "- Alternative viewpoints not present in other sources\n"
-            "- Recent news updates and announcements\n"
-            "- Microsoft ecosystem or industry-specific insights\n\n"
-            "Summarize the distinct and useful information found in these results."
-        )
 
-    @staticmethod
-    def bing_analysis_user(question: str, bing_output: str) -> str:
-        """User prompt: Provide Bing search results."""
-        return (
-            f"Question: {question}\n\n"
-            f"Bing Search Results:\n{bing_output}\n\n"
-            "Analyze these Bing results and highlight insights that complement findings from other sources."
-        )
+# -------------------------------------------------------------------------
+# 💬 Reddit Discussion Analysis
+# -------------------------------------------------------------------------
+# System prompt: Analyze Reddit discussion threads.
+REDDIT_DISCUSSION_SYSTEM = (
+    "You are a specialist in understanding online community discussions. Review Reddit posts and comments "
+    "to extract practical user experiences and collective opinions.\n\n"
+    "Focus on:\n"
+    "- Real user experiences and feedback\n"
+    "- Popular consensus or recurring sentiments\n"
+    "- Useful advice, debates, and diverse perspectives\n"
+    "- Direct quotes from posts (use quotation marks and mention subreddit if available)\n\n"
+    "Provide a balanced summary capturing both positive and negative experiences."
+)
 
-    # -------------------------------------------------------------------------
-    # 💬 Reddit Discussion Analysis
-    # -------------------------------------------------------------------------
-    @staticmethod
-    def reddit_discussion_system() -> str:
-        """System prompt: Analyze Reddit discussion threads."""
-        return (
-            "You are a specialist in understanding online community discussions. Review Reddit posts and comments "
-            "to extract practical user experiences and collective opinions.\n\n"
-            "Focus on:\n"
-            "- Real user experiences and feedback\n"
-            "- Popular consensus or recurring sentiments\n"
-            "- Useful advice, debates, and diverse perspectives\n"
-            "- Direct quotes from posts (use quotation marks and mention subreddit if available)\n\n"
-            "Provide a balanced summary capturing both positive and negative experiences."
-        )
+
+# -------------------------------------------------------------------------
+# 🧩 Final Answer Synthesis
+# -------------------------------------------------------------------------
+# System prompt: Combine insights from all sources.
+SYNTHESIS_SYSTEM = (
+    "You are a professional research synthesizer. Combine the findings from Google, Bing, and Reddit analyses "
+    "to create a unified, well-reasoned summary.\n\n"
+    "Your response should:\n"
+    "- Integrate information from all three sources\n"
+    "- Identify overlapping and conflicting insights\n"
+    "- Present a structured and balanced summary\n"
+    "- Attribute key claims to their source type (Google, Bing, Reddit)\n"
+    "- Highlight uncertainties or differing perspectives\n\n"
+    "Output a clear, comprehensive synthesis that answers the question holistically."
+)
+
+_SYNTHESIS_USER_TMPL = (
+    "Question: {question}\n\n"
+    "Google Analysis:\n{google_summary}\n\n"
+    "Bing Analysis:\n{bing_summary}\n\n"
+    "Reddit Discussion Analysis:\n{reddit_summary}\n\n"
+    "Combine these analyses into a unified, detailed response that reflects multiple perspectives."
+)
+
+
+# -------------------------------------------------------------------------
+# 🔀 Combined Source Analysis (Google + Bing + Reddit in one call)
+# -------------------------------------------------------------------------
+# System prompt: Analyze all three sources and return one summary per source.
+TRI_ANALYSIS_SYSTEM = (
+    "You will receive Google search results, Bing search results, and Reddit posts with comments "
+    "for the same question. Analyze each source independently, following its brief below, and "
+    "return one summary per source using only information from that source.\n\n"
+    "===== GOOGLE BRIEF =====\n" + GOOGLE_ANALYSIS_SYSTEM + "\n\n"
+    "===== BING BRIEF =====\n" + BING_ANALYSIS_SYSTEM + "\n\n"
+    "===== REDDIT BRIEF =====\n" + REDDIT_DISCUSSION_SYSTEM
+)
+
+_TRI_ANALYSIS_USER_TMPL = (
+    "Question: {question}\n\n"
+    "===== GOOGLE SEARCH RESULTS =====\n{google_output}\n\n"
+    "===== BING SEARCH RESULTS =====\n{bing_output}\n\n"
+    "===== REDDIT SEARCH RESULTS =====\n{reddit_output}\n\n"
+    "===== DETAILED REDDIT POST DATA =====\n{post_data}\n\n"
+    "Produce a Google summary, a Bing summary, and a Reddit summary that help answer the question."
+)
+
+
+# Role skeleton for a (system, user) message pair; shallow-copied per call.
+_MSG_TEMPLATE = ({"role": "system"}, {"role": "user"})
+
+
+class PromptFactory:
+    """Centralized repository for all LLM prompt templates used by the Deep Research Agent."""
 
     @staticmethod
-    def reddit_discussion_user(
-        question: str, reddit_output: str, post_data: list
-    ) -> str:
-        """User prompt: Provide Reddit data for analysis."""
-        return (
-            f"Question: {question}\n\n"
-            f"Reddit Search Results:\n{reddit_output}\n\n"
-            f"Detailed Reddit Post Data:\n{post_data}\n\n"
-            "Analyze the Reddit content and extract community insights, common opinions, and real-world experiences."
+    def reddit_url_selector_user(question: str, reddit_output: str) -> str:
+        """User prompt: Provide Reddit search results for filtering."""
+        return _render_within_budget(
+            _REDDIT_URL_SELECTOR_USER_TMPL,
+            {"question": question},
+            {"reddit_output": reddit_output},
         )
 
-    # -------------------------------------------------------------------------
-    # 🧩 Final Answer Synthesis
-    # -------------------------------------------------------------------------
     @staticmethod
-    def synthesis_system() -> str:
-        """System prompt: Combine insights from all sources."""
-        return (
-            "You are a professional research synthesizer. Combine the findings from Google, Bing, and Reddit analyses "
-            "to create a unified, well-reasoned summary.\n\n"
-            "Your response should:\n"
-            "- Integrate information from all three sources\n"
-            "- Identify overlapping and conflicting insights\n"
-            "- Present a structured and balanced summary\n"
-            "- Attribute key claims to their source type (Google, Bing, Reddit)\n"
-            "- Highlight uncertainties or differing perspectives\n\n"
-            "Output a clear, comprehensive synthesis that answers the question holistically."
+    def tri_analysis_user(
+        question: str, google_output: str, bing_output: str, reddit_output: str, post_data: str
+    ) -> str:
+        """User prompt: Provide all three sources for a single combined analysis."""
+        return _render_within_budget(
+            _TRI_ANALYSIS_USER_TMPL,
+            {"question": question},
+            {
+                "google_output": google_output,
+                "bing_output": bing_output,
+                "reddit_output": reddit_output,
+                "post_data": post_data,
+            },
         )
 
     @staticmethod
@@ -133,23 +157,133 @@ class PromptFactory:
         question: str, google_summary: str, bing_summary: str, reddit_summary: str
     ) -> str:
         """User prompt: Provide all analyses for synthesis."""
-        return (
-            f"Question: {question}\n\n"
-            f"Google Analysis:\n{google_summary}\n\n"
-            f"Bing Analysis:\n{bing_summary}\n\n"
-            f"Reddit Discussion Analysis:\n{reddit_summary}\n\n"
-            "Combine these analyses into a unified, detailed response that reflects multiple perspectives."
+        return _SYNTHESIS_USER_TMPL.format_map(
+            {
+                "question": question,
+                "google_summary": google_summary,
+                "bing_summary": bing_summary,
+                "reddit_summary": reddit_summary,
+            }
         )
 
 
+# -------------------------------------------------------------------------
+# Payload Compaction (bounds the raw search data embedded in prompts)
+# -------------------------------------------------------------------------
+# Budget for a whole user prompt; the data sections inside it share what's left
+# after the template text and the question.
+MAX_PROMPT_CHARS = 16000
+MAX_SERP_RESULTS = 15
+MAX_COMMENT_CHARS = 500
+MAX_POST_CHARS = 4000
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _truncate(text: str, limit: int = MAX_PROMPT_CHARS) -> str:
+    """Cut `text` to `limit` characters, marking the cut with an ellipsis."""
+    if len(text) <= limit:
+        return text
+    return text[: limit - 1] + "…" if limit > 0 else ""
+
+
+def _fit_sections(sections: Dict[str, str], budget: int) -> Dict[str, str]:
+    """
+    Truncate `sections` so their combined length fits `budget`.
+
+    Short sections are kept whole and whatever they don't use is shared out
+    evenly among the longer ones.
+    """
+    remaining = max(budget, 0)
+    fitted = {}
+    ordered = sorted(sections.items(), key=lambda kv: len(kv[1]))
+    for i, (name, text) in enumerate(ordered):
+        fitted[name] = _truncate(text, remaining // (len(ordered) - i))
+        remaining -= len(fitted[name])
+    return fitted
+
+
+def _render_within_budget(
+    template: str, fixed: Dict[str, Any], sections: Dict[str, Any], budget: int = MAX_PROMPT_CHARS
+) -> str:
+    """Fill `template`, truncating the data `sections` so the result stays within `budget`."""
+    sections = {name: str(text) for name, text in sections.items()}
+    overhead = len(template.format_map({**fixed, **dict.fromkeys(sections, "")}))
+    return template.format_map({**fixed, **_fit_sections(sections, budget - overhead)})
+
+
+def _dumps(obj: Any) -> str:
+    return orjson.dumps(obj, default=str).decode()
+
+
+def compact_serp_output(serp_output: Dict[str, Any] | None) -> str:
+    """Reduce a SERP result to the knowledge panel plus title/snippet/link of the top results."""
+    if not serp_output:
+        return "No results."
+
+    organic = [
+        {
+            "title": r.get("title"),
+            "snippet": r.get("description") or r.get("snippet"),
+            "link": r.get("link"),
+        }
+        for r in serp_output.get("organic", [])[:MAX_SERP_RESULTS]
+        if isinstance(r, dict)
+    ]
+    return _truncate(_dumps({"knowledge": serp_output.get("knowledge") or {}, "organic": organic}))
+
+
+def compact_reddit_search(reddit_output: Dict[str, Any] | None) -> str:
+    """Reduce Reddit keyword-search results to their titles and URLs."""
+    if not reddit_output:
+        return "No results."
+    return _truncate(_dumps(reddit_output.get("parsed_posts", [])))
+
+
+def compact_reddit_comments(posts_data: Dict[str, Any] | None) -> str:
+    """
+    Reduce retrieved Reddit comments to a bounded, per-post bullet list.
+
+    Comments are grouped by post and ordered by upvotes. HTML is stripped, each
+    comment is capped at MAX_COMMENT_CHARS and each post at MAX_POST_CHARS, so one
+    long thread can't crowd out the others. Posts with the best-voted comments come first.
+    """
+    if not posts_data:
+        return "No comments."
+
+    columns = posts_data["comments"]
+    posts: Dict[str, List[tuple]] = {}
+    for content, upvotes, post_url in zip(
+        columns["content"], columns["upvotes"], columns["post_url"]
+    ):
+        if content:
+            text = _HTML_TAG_RE.sub("", html.unescape(content)).strip()[:MAX_COMMENT_CHARS]
+            posts.setdefault(post_url or "unknown post", []).append((upvotes or 0, text))
+
+    blocks = []
+    for post_url, comments in posts.items():
+        comments.sort(key=lambda c: c[0], reverse=True)
+        lines, used = [f"Post: {post_url}"], 0
+        for upvotes, text in comments:
+            line = f"- [{upvotes} upvotes] {text}"
+            used += len(line) + 1
+            if used > MAX_POST_CHARS:
+                break
+            lines.append(line)
+        blocks.append((comments[0][0], "\n".join(lines)))
+
+    blocks.sort(key=lambda b: b[0], reverse=True)
+    return "\n\n".join(block for _, block in blocks) or "No comments."
+
+
 # -------------------------------------------------------------------------
 # Utility Functions
 # -------------------------------------------------------------------------
 def make_message_pair(system_msg: str, user_msg: str) -> List[Dict[str, Any]]:
     """Standardizes the message structure for LLM input."""
+    system, user = _MSG_TEMPLATE
     return [
-        {"role": "system", "content": system_msg},
-        {"role": "user", "content": user_msg},
+        {**system, "content": system_msg},
+        {**user, "content": user_msg},
     ]
 
 
@@ -159,34 +293,18 @@ def make_message_pair(system_msg: str, user_msg: str) -> List[Dict[str, Any]]:
 def reddit_url_analysis_msgs(question: str, reddit_output: str) -> List[Dict[str, Any]]:
     """Generate messages for Reddit URL relevance analysis."""
     return make_message_pair(
-        PromptFactory.reddit_url_selector_system(),
+        REDDIT_URL_SELECTOR_SYSTEM,
         PromptFactory.reddit_url_selector_user(question, reddit_output),
     )
 
 
-def google_analysis_msgs(question: str, google_output: str) -> List[Dict[str, Any]]:
-    """Generate messages for Google search result analysis."""
-    return make_message_pair(
-        PromptFactory.google_analysis_system(),
-        PromptFactory.google_analysis_user(question, google_output),
-    )
-
-
-def bing_analysis_msgs(question: str, bing_output: str) -> List[Dict[str, Any]]:
-    """Generate messages for Bing search result analysis."""
-    return make_message_pair(
-        PromptFactory.bing_analysis_system(),
-        PromptFactory.bing_analysis_user(question, bing_output),
-    )
-
-
-def reddit_discussion_msgs(
-    question: str, reddit_output: str, post_data: list
+def tri_analysis_msgs(
+    question: str, google_output: str, bing_output: str, reddit_output: str, post_data: str
 ) -> List[Dict[str, Any]]:
-    """Generate messages for Reddit discussion thread analysis."""
+    """Generate messages for analyzing Google, Bing, and Reddit results in one call."""
     return make_message_pair(
-        PromptFactory.reddit_discussion_system(),
-        PromptFactory.reddit_discussion_user(question, reddit_output, post_data),
+        TRI_ANALYSIS_SYSTEM,
+        PromptFactory.tri_analysis_user(question, google_output, bing_output, reddit_output, post_data),
     )
 
 
@@ -195,6 +313,6 @@ def synthesis_msgs(
 ) -> List[Dict[str, Any]]:
     """Generate messages for final synthesis and answer generation."""
     return make_message_pair(
-        PromptFactory.synthesis_system(),
+        SYNTHESIS_SYSTEM,
         PromptFactory.synthesis_user(question, google_summary, bing_summary, reddit_summary),
-    )
\ No newline at end of file
+    )
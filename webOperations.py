@@ -1,52 +1,117 @@
 import os
-import requests
+import logging
+import asyncio
+import aiohttp
+import orjson
 from dotenv import load_dotenv
+from functools import lru_cache
+from operator import methodcaller
 from urllib.parse import quote_plus
-from snapshot_operations import fetch_snapshot_data, check_snapshot_status
+from snapshot_operations import (
+    fetch_snapshot_data,
+    check_snapshot_status,
+    send_request,
+    breaker,
+)
 
 # -------------------------------------------------------------------------
 # Load environment variables
 # -------------------------------------------------------------------------
 load_dotenv()
 
+logger = logging.getLogger("deepsearch")
+
 # -------------------------------------------------------------------------
 # Configuration
 # -------------------------------------------------------------------------
 REDDIT_DISCOVERY_DATASET = "gd_lvz8ah06191smkebj4"
 REDDIT_POSTS_DATASET = "gd_lvzdpsdlw09j6t702"
 BRIGHTDATA_API_BASE = "https://api.brightdata.com"
+REDDIT_URLS_PER_SNAPSHOT = 2
+MAX_CONCURRENT_SNAPSHOTS = 8
+
+# Output column -> Bright Data field for retrieved Reddit comments
+COMMENT_FIELDS = {
+    "comment_id": "comment_id",
+    "content": "comment",
+    "date": "date_posted",
+    "upvotes": "num_upvotes",
+    "post_url": "post_url",
+}
+
+_API_KEY = os.getenv("BRIGHTDATA_API_KEY")
+_REQUEST_HEADERS = (
+    {
+        "Authorization": f"Bearer {_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    if _API_KEY
+    else None
+)
 
 # -------------------------------------------------------------------------
 # 🧩 Helper: General API Request Wrapper
 # -------------------------------------------------------------------------
-def _send_api_request(url: str, **kwargs) -> dict | None:
+async def _send_api_request(url: str, **kwargs) -> dict | None:
     """Send a POST request to the Bright Data API with authentication headers."""
-    api_key = os.getenv("BRIGHTDATA_API_KEY")
-    if not api_key:
+    if not _REQUEST_HEADERS:
         raise EnvironmentError("Missing BRIGHTDATA_API_KEY in environment variables.")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    if breaker.is_open():
+        logger.warning("⚠️ Skipping request: Bright Data circuit is open")
+        return None
 
     try:
-        response = requests.post(url, headers=headers, **kwargs)
+        response, body = await send_request("POST", url, headers=_REQUEST_HEADERS, **kwargs)
         response.raise_for_status()
-        return response.json()
+        data = orjson.loads(body)
 
-    except requests.exceptions.RequestException as err:
-        print(f"⚠️ Request failed: {err}")
+    except aiohttp.ClientError as err:
+        logger.warning("⚠️ Request failed: %s", err)
+        breaker.record_failure(err)
         return None
     except Exception as err:
-        print(f"❌ Unexpected error during API call: {err}")
+        logger.error("❌ Unexpected error during API call: %s", err)
+        breaker.record_failure(err)
         return None
 
+    breaker.record_success()
+    return data
+
+
+# -------------------------------------------------------------------------
+# 🧩 Helper: Columnar record extraction
+# -------------------------------------------------------------------------
+def _to_columns(records: list[dict], fields: dict[str, str]) -> dict[str, list]:
+    """
+    Pluck `fields` out of `records` into a column-per-field dict.
+
+    Building one list per field avoids allocating a dict per record, which adds up
+    on snapshots with thousands of comments.
+    """
+    return {
+        column: list(map(methodcaller("get", source), records))
+        for column, source in fields.items()
+    }
+
 
 # -------------------------------------------------------------------------
 # 🌐 Search: Google / Bing SERP
 # -------------------------------------------------------------------------
-def serp_search(query: str, engine: str = "google") -> dict | None:
+SERP_REQUEST_URL = f"{BRIGHTDATA_API_BASE}/request"
+SERP_URL_TEMPLATES = {
+    "google": "https://www.google.com/search?q={}&brd_json=1",
+    "bing": "https://www.bing.com/search?q={}&brd_json=1",
+}
+
+
+@lru_cache(maxsize=256)
+def _encode_query(query: str) -> str:
+    """URL-encode a search query; shared by the Google and Bing branches."""
+    return quote_plus(query)
+
+
+async def serp_search(query: str, engine: str = "google") -> dict | None:
     """
     Perform a SERP (Search Engine Results Page) search using Bright Data proxy.
 
@@ -57,22 +122,16 @@ def serp_search(query: str, engine: str = "google") -> dict | None:
     Returns:
         dict | None: Extracted search results with 'knowledge' and 'organic' sections.
     """
-    base_urls = {
-        "google": "https://www.google.com/search",
-        "bing": "https://www.bing.com/search",
-    }
-
-    if engine not in base_urls:
+    if engine not in SERP_URL_TEMPLATES:
         raise ValueError(f"Invalid search engine '{engine}'. Supported: google, bing")
 
-    api_url = f"{BRIGHTDATA_API_BASE}/request"
     payload = {
         "zone": "ai_agent2",
-        "url": f"{base_urls[engine]}?q={quote_plus(query)}&brd_json=1",
+        "url": SERP_URL_TEMPLATES[engine].format(_encode_query(query)),
         "format": "raw",
     }
 
-    response_data = _send_api_request(api_url, json=payload)
+    response_data = await _send_api_request(SERP_REQUEST_URL, json=payload)
     if not response_data:
         return None
 
@@ -85,36 +144,36 @@ def serp_search(query: str, engine: str = "google") -> dict | None:
 # -------------------------------------------------------------------------
 # 🧠 Snapshot Utility: Trigger → Wait → Download
 # -------------------------------------------------------------------------
-def _execute_snapshot_pipeline(
+async def _execute_snapshot_pipeline(
     trigger_url: str,
     params: dict,
     payload: list,
     task_name: str = "snapshot",
 ) -> list | None:
     """Trigger a Bright Data snapshot and handle progress + download."""
-    trigger_response = _send_api_request(trigger_url, params=params, json=payload)
+    trigger_response = await _send_api_request(trigger_url, params=params, json=payload)
     if not trigger_response:
-        print(f"❌ Failed to trigger {task_name} snapshot.")
+        logger.error("❌ Failed to trigger %s snapshot", task_name)
         return None
 
     snapshot_id = trigger_response.get("snapshot_id")
     if not snapshot_id:
-        print(f"⚠️ No snapshot_id returned for {task_name}.")
+        logger.warning("⚠️ No snapshot_id returned for %s", task_name)
         return None
 
     # Wait for snapshot completion
-    if not check_snapshot_status(snapshot_id):
-        print(f"❌ {task_name.capitalize()} snapshot did not complete successfully.")
+    if not await check_snapshot_status(snapshot_id):
+        logger.error("❌ %s snapshot did not complete successfully", task_name)
         return None
 
     # Download completed snapshot
-    return fetch_snapshot_data(snapshot_id)
+    return await fetch_snapshot_data(snapshot_id)
 
 
 # -------------------------------------------------------------------------
 # 🔎 Reddit Search by Keyword
 # -------------------------------------------------------------------------
-def reddit_search_api(
+async def reddit_search_api(
     keyword: str,
     date: str = "All time",
     sort_by: str = "Hot",
@@ -150,7 +209,7 @@ def reddit_search_api(
         }
     ]
 
-    snapshot_data = _execute_snapshot_pipeline(trigger_url, params, payload, "reddit search")
+    snapshot_data = await _execute_snapshot_pipeline(trigger_url, params, payload, "reddit search")
     if not snapshot_data:
         return None
 
@@ -169,7 +228,7 @@ def reddit_search_api(
 # -------------------------------------------------------------------------
 # 💬 Reddit Comment Retrieval
 # -------------------------------------------------------------------------
-def reddit_post_retrieval(
+async def reddit_post_retrieval(
     urls: list[str],
     days_back: int = 10,
     load_all_replies: bool = False,
@@ -178,6 +237,9 @@ def reddit_post_retrieval(
     """
     Retrieve comments from Reddit posts.
 
+    URLs are split into small chunks, each triggered and polled as its own
+    snapshot concurrently, so one slow thread doesn't stall the whole batch.
+
     Args:
         urls (list[str]): List of Reddit post URLs.
         days_back (int): Limit comments by date range.
@@ -188,7 +250,7 @@ def reddit_post_retrieval(
         dict | None: Extracted comments with total count.
     """
     if not urls:
-        print("⚠️ No Reddit URLs provided.")
+        logger.warning("⚠️ No Reddit URLs provided")
         return None
 
     trigger_url = f"{BRIGHTDATA_API_BASE}/datasets/v3/trigger"
@@ -198,31 +260,40 @@ def reddit_post_retrieval(
         "include_errors": "true",
     }
 
-    payload = [
-        {
-            "url": url,
-            "days_back": days_back,
-            "load_all_replies": load_all_replies,
-            "comment_limit": comment_limit,
-        }
-        for url in urls
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SNAPSHOTS)
+
+    async def _retrieve_chunk(chunk: list[str]) -> list | None:
+        payload = [
+            {
+                "url": url,
+                "days_back": days_back,
+                "load_all_replies": load_all_replies,
+                "comment_limit": comment_limit,
+            }
+            for url in chunk
+        ]
+        async with semaphore:
+            return await _execute_snapshot_pipeline(trigger_url, params, payload, "reddit comments")
+
+    chunks = [
+        urls[i:i + REDDIT_URLS_PER_SNAPSHOT]
+        for i in range(0, len(urls), REDDIT_URLS_PER_SNAPSHOT)
     ]
+    results = await asyncio.gather(*(_retrieve_chunk(c) for c in chunks), return_exceptions=True)
+
+    snapshot_data = []
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning("⚠️ Reddit comment chunk failed: %s", result)
+        elif result:
+            snapshot_data.extend(result)
 
-    snapshot_data = _execute_snapshot_pipeline(trigger_url, params, payload, "reddit comments")
     if not snapshot_data:
         return None
 
-    parsed_comments = [
-        {
-            "comment_id": comment.get("comment_id"),
-            "content": comment.get("comment"),
-            "date": comment.get("date_posted"),
-        }
-        for comment in snapshot_data
-        if isinstance(comment, dict)
-    ]
+    records = list(filter(dict.__instancecheck__, snapshot_data))
 
     return {
-        "comments": parsed_comments,
-        "total_retrieved": len(parsed_comments),
-    }
\ No newline at end of file
+        "comments": _to_columns(records, COMMENT_FIELDS),
+        "total_retrieved": len(records),
+    }